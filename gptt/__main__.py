@@ -117,36 +117,21 @@ def main():
         if args[arg[0]] is None:
             raise ValueError(f'"{arg[1]}" must be passed either via the command line or the config file.')
 
-    # parse the passed vehicle type names into a dict to work with later on
-    vehicle_type_names = {}
-    for vt in args['vehicle_type_names']:
-        if len(vt.split('=')) != 2:
-            raise ValueError(f'Error in vehicle type name definition "{vt}" – it must have exactly one = sign')
-        # the key and value should be the passed string split at the '=' and
-        # stripped of any spaces around it.
-        k, v = [x.strip() for x in vt.split('=')]
-        vehicle_type_names[k] = v
-    
-    # parse the passed station name replacements to work with later on
-    # this is a list and the replacement is done in sequence
-    # so the order does matter
-    station_name_replacements = []
-    for sn in args['replacements']:
-        if len(sn.split('=')) != 2:
-            raise ValueError(f'Error in station name text replacement definition "{sn}" – it must have exactly one = sign')
-        # the replacement data should be the passed string split at the '=' and
-        # stripped of any spaces around it.
-        # it is turned into a list of two elements, which are then added to a
-        # longer list of all substitutions, which will be carried out
-        # sequentially.
-        station_name_replacements.append([x.strip() for x in sn.split('=')])
+    # parse the passed vehicle type names and station name replacements into
+    # a normalizer that will be used for all the steps of all the routes.
+    # the station name replacements are done in sequence, so their order
+    # does matter.
+    step_normalizer = timetables.StepNormalizer.from_specs(
+        vehicle_type_names=args['vehicle_type_names'],
+        station_name_replacements=args['replacements']
+    )
 
     # get the data – it will be a dict
     timetable_data = \
         timetables.get_transit_plans_for_day(
             origin=args['origin'], destination=args['destination'], api_key=args['api_key'], date=args['date'], 
-            language=args['lang'], vehicle_type_names=vehicle_type_names, station_name_replacements=station_name_replacements,
-            max_transfers=args['max_transfers'], get_station_localities=True, verbose=args['verbose']
+            language=args['lang'], max_transfers=args['max_transfers'], get_station_localities=True,
+            verbose=args['verbose'], step_normalizer=step_normalizer
         )
 
     # keep the data as json if to_json, else render it into a template file
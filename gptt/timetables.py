@@ -1,5 +1,6 @@
 import requests
 import json
+import re
 import sys
 import logging
 
@@ -38,6 +39,104 @@ class NoEligibleRoutesError(RuntimeError):
     """
     pass
 
+class StepNormalizer:
+    """Normalizes the station names and vehicle types of transit steps.
+
+    The station name replacements are compiled once into a single regular
+    expression which is used to skip names that none of the rules apply to;
+    names that do match are still processed by the replacements sequentially
+    (in the given order), so the results are exactly the same as applying
+    each replacement one after the other. Results are cached per unique
+    station name, therefore a normalizer can be reused across many requests
+    (e.g. for all the departure times of a day, or for several days).
+    """
+
+    def __init__(self, vehicle_type_names={}, station_name_replacements=[]):
+        """
+        Keyword Arguments:
+            vehicle_type_names {dict} -- values used to replace the
+             VEHICLE_TYPE field in the API response, e.g. {'HEAVY_RAIL':'Ⓣ'}
+             (default: {{}})
+            station_name_replacements {list} -- list of replacements to be
+             done in the station names, e.g. [["Hauptbahnhof", "hbf."],
+             ["Bahnhof", "bf."]] (default: {[]})
+        """
+        self.vehicle_type_names = dict(vehicle_type_names)
+        self.station_name_replacements = [tuple(r) for r in station_name_replacements]
+
+        # a name can only be changed by the sequence of replacements if at
+        # least one of the strings to be replaced occurs in it, so a single
+        # search for any of them tells us whether we need to do anything.
+        if self.station_name_replacements:
+            self._station_name_pattern = re.compile(
+                '|'.join(re.escape(old) for old, _ in self.station_name_replacements)
+            )
+        else:
+            self._station_name_pattern = None
+
+        self._station_name_cache = {}
+
+    @classmethod
+    def from_specs(cls, vehicle_type_names=None, station_name_replacements=None):
+        """Create a normalizer from '=' separated strings such as the ones
+        passed on the command line or in the config file.
+
+        Keyword Arguments:
+            vehicle_type_names {list} -- strings like "HEAVY_RAIL=Ⓣ"
+             (default: {None})
+            station_name_replacements {list} -- strings like
+             "Hauptbahnhof=hbf."; the order matters as the replacements are
+             done in sequence (default: {None})
+
+        Raises:
+            ValueError: if any of the strings does not have exactly one = sign
+
+        Returns:
+            StepNormalizer -- the normalizer built from the passed strings
+        """
+        # parse the passed vehicle type names into a dict
+        parsed_vehicle_type_names = {}
+        for vt in vehicle_type_names or []:
+            if len(vt.split('=')) != 2:
+                raise ValueError(f'Error in vehicle type name definition "{vt}" – it must have exactly one = sign')
+            # the key and value should be the passed string split at the '='
+            # and stripped of any spaces around it.
+            k, v = [x.strip() for x in vt.split('=')]
+            parsed_vehicle_type_names[k] = v
+
+        # parse the passed station name replacements into a list of pairs
+        parsed_station_name_replacements = []
+        for sn in station_name_replacements or []:
+            if len(sn.split('=')) != 2:
+                raise ValueError(f'Error in station name text replacement definition "{sn}" – it must have exactly one = sign')
+            parsed_station_name_replacements.append([x.strip() for x in sn.split('=')])
+
+        return cls(vehicle_type_names=parsed_vehicle_type_names,
+                   station_name_replacements=parsed_station_name_replacements)
+
+    def station_name(self, name):
+        """Apply the station name replacements to name (e.g. to shorten
+        Hauptbahnhof to Hbf).
+        """
+        try:
+            return self._station_name_cache[name]
+        except KeyError:
+            pass
+
+        result = name
+        if self._station_name_pattern is not None and self._station_name_pattern.search(name):
+            for r in self.station_name_replacements:
+                result = result.replace(*r)
+
+        self._station_name_cache[name] = result
+        return result
+
+    def vehicle_type(self, vehicle_type):
+        """Get the display name of vehicle_type, or, if there is none, the
+        value returned by the API.
+        """
+        return self.vehicle_type_names.get(vehicle_type, vehicle_type)
+
 def get_location_time_offset(location, unix_timestamp, api_key):
     """Get the time offset from UTC of location at unix_timestamp from Google
     APIs using the api_key
@@ -107,7 +206,8 @@ def get_location_time_offset(location, unix_timestamp, api_key):
     }
 
 def get_transit_plan_for_timestamp(origin, destination, api_key, unix_timestamp, 
-                                   language='en', vehicle_type_names={}, station_name_replacements=[], verbose=False):
+                                   language='en', vehicle_type_names={}, station_name_replacements=[], verbose=False,
+                                   step_normalizer=None):
     """Get first transit connection after unix_timestamp from origin to destination using api_key
 
     Arguments:
@@ -130,6 +230,9 @@ def get_transit_plan_for_timestamp(origin, destination, api_key, unix_timestamp,
         station_name_replacements {list} -- list of replacements to be done
          in the station names, e.g. [["Hauptbahnhof", "hbf.], ["Bahnhof",
          "bf."]] (default: {[]})
+        step_normalizer {StepNormalizer} -- a normalizer to use instead of
+         vehicle_type_names and station_name_replacements; pass the same one
+         to several calls to reuse its cache. (default: {None})
 
     Raises:
         DirectionsAPIGenericError: the Directions API encountered an error.
@@ -182,6 +285,9 @@ def get_transit_plan_for_timestamp(origin, destination, api_key, unix_timestamp,
     # ignore walking directions between stops
     transit_steps = [x for x in leg['steps'] if x['travel_mode'] != 'WALKING'] 
     
+    if step_normalizer is None:
+        step_normalizer = StepNormalizer(vehicle_type_names, station_name_replacements)
+
     # initialize result container which will contain a dict for each step
     transit_results = []
 
@@ -194,32 +300,24 @@ def get_transit_plan_for_timestamp(origin, destination, api_key, unix_timestamp,
 
         step_data = {}
 
-        step_data['departure_stop'] = s['departure_stop']['name']
         # replace whatever needs to be replaced in departure station names
-        # (e.g. to shorten Hauptbahnhof to Hbf) and do this sequentially over
-        # the passed list of replacements:
-        for r in station_name_replacements:
-            step_data['departure_stop'] = step_data['departure_stop'].replace(*r)
-        step_data['departure_location'] = str(s['departure_stop']['location']['lat']) + \
-                                          ',' + str(s['departure_stop']['location']['lng'])
+        # (e.g. to shorten Hauptbahnhof to Hbf)
+        step_data['departure_stop'] = step_normalizer.station_name(s['departure_stop']['name'])
+        step_data['departure_location'] = f"{s['departure_stop']['location']['lat']},{s['departure_stop']['location']['lng']}"
         step_data['departure_time'] = s['departure_time']['text']
         step_data['departure_time_epoch'] = s['departure_time']['value']
         
-        step_data['arrival_stop'] = s['arrival_stop']['name']
         # replace whatever needs to be replaced in arrival station names
-        # (e.g. to shorten Hauptbahnhof to Hbf) and do this sequentially over
-        # the passed list of replacements:
-        for r in station_name_replacements:
-            step_data['arrival_stop'] = step_data['arrival_stop'].replace(*r)
-        step_data['arrival_location'] = str(s['arrival_stop']['location']['lat']) + \
-                                        ',' + str(s['arrival_stop']['location']['lng'])
+        # (e.g. to shorten Hauptbahnhof to Hbf)
+        step_data['arrival_stop'] = step_normalizer.station_name(s['arrival_stop']['name'])
+        step_data['arrival_location'] = f"{s['arrival_stop']['location']['lat']},{s['arrival_stop']['location']['lng']}"
         step_data['arrival_time'] = s['arrival_time']['text']
         step_data['arrival_time_epoch'] = s['arrival_time']['value']
 
         step_data['vehicle'] = s['line']['vehicle']['name']
         # get the vehicle type name from the vehicle_type_names dict,
         # or, if it does not exist there, use what was returned by the API.
-        step_data['vehicle_type'] = vehicle_type_names.get(s['line']['vehicle']['type'], s['line']['vehicle']['type'])
+        step_data['vehicle_type'] = step_normalizer.vehicle_type(s['line']['vehicle']['type'])
         step_data['headsign'] = s['headsign']
         step_data['line_short_name'] = s['line'].get('short_name')
         step_data['line_name'] = s['line'].get('name')
@@ -232,7 +330,7 @@ def get_transit_plan_for_timestamp(origin, destination, api_key, unix_timestamp,
 
 def get_transit_plans_for_day(origin, destination, api_key, date, 
                               language='en', max_transfers=99, vehicle_type_names={}, station_name_replacements=[],
-                              get_station_localities=False, verbose=False):
+                              get_station_localities=False, verbose=False, step_normalizer=None):
     """Call the get_transit_plan_for_timestamp() function as many times as
     needed from the beginning of the day until the end of the day to fetch all
     transit routes suggested by Google on this date between the origin and
@@ -263,6 +361,10 @@ def get_transit_plans_for_day(origin, destination, api_key, date,
          village, etc.) of the transit stops? This can be used in the output
          but it requires more API calls. (default: {False})
         verbose {bool} -- Print diagnostic messages to stderr
+        step_normalizer {StepNormalizer} -- Normalizer used instead of
+         vehicle_type_names and station_name_replacements, will be passed to
+         get_transit_plan_for_timestamp(). If not given, one is built from
+         them and shared by all the requests of the day. (default: {None})
 
     Raises:
         NoEligibleRoutesError: raised when max_transfers is too high and we end
@@ -277,6 +379,10 @@ def get_transit_plans_for_day(origin, destination, api_key, date,
 
     total_api_calls = 0 #not used for anything right now
 
+    # compile the normalization rules once for all the requests of the day
+    if step_normalizer is None:
+        step_normalizer = StepNormalizer(vehicle_type_names, station_name_replacements)
+
     # set the departure time unix timestamp to the beginning of the day
     utc_time = datetime.strptime(f'{date}T00:00:00.000Z', '%Y-%m-%dT%H:%M:%S.%fZ')
     start_of_day = int((utc_time - datetime(1970, 1, 1)).total_seconds())
@@ -319,8 +425,8 @@ def get_transit_plans_for_day(origin, destination, api_key, date,
                     unix_timestamp=this_departure_time, 
                     language=language,
                     vehicle_type_names=vehicle_type_names,
-                    station_name_replacements=station_name_replacements,
-                    verbose=verbose
+                    verbose=verbose,
+                    step_normalizer=step_normalizer
                 )
             total_api_calls += 1
             failed_attempts = 0